@@ -3,26 +3,14 @@ FastAPI dependencies for structured logging.
 """
 
 from fastapi import Request
-import structlog
+from structlog.typing import FilteringBoundLogger
 
-from .logger import get_logger
 
-# Default logger for routes that don't have middleware context
-default_logger = get_logger(__name__)
-
-
-def get_request_logger(request: Request) -> structlog.stdlib.BoundLogger:
+def get_request_logger(request: Request) -> FilteringBoundLogger:
     """
     Get the logger with user context bound from middleware.
     
-    Falls back to default logger if middleware is not configured.
+    ``UserContextMiddleware`` is installed on the app and binds this logger
+    for every request before any route runs.
     """
-    if hasattr(request.state, "logger"):
-        return request.state.logger
-    else:
-        # Fallback for routes not using middleware
-        return default_logger.bind(
-            route=request.url.path,
-            method=request.method,
-            user="unknown",
-        )
\ No newline at end of file
+    return request.state.logger
\ No newline at end of file
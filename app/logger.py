@@ -2,44 +2,358 @@
 Structured logging configuration using structlog.
 """
 
-import logging.config
+import asyncio
+import atexit
+import io
+import json
+import logging
+import os
+import socket
 import sys
-from typing import Any, Dict
+import threading
+import time
+import traceback
+from typing import Any, FrozenSet, List, NamedTuple
 
+import orjson
 import structlog
+from structlog.typing import EventDict, FilteringBoundLogger, WrappedLogger
 
-# Configure standard library logging
-logging.basicConfig(
-    format="%(message)s",
-    stream=sys.stdout,
-    level=logging.INFO,
-)
+# Process-wide values looked up once instead of per event (the pid again after fork)
+_HOSTNAME = socket.gethostname()
+_PID = os.getpid()
+
+# Minimum level for bound loggers and pre-rendered events alike, set only
+# through LOG_LEVEL: loggers created at import keep the filtering wrapper
+# class they were built with.
+_level = logging.getLevelName(os.environ.get("LOG_LEVEL", "INFO").upper())
+if not isinstance(_level, int):
+    raise ValueError(f"Unknown LOG_LEVEL: {os.environ['LOG_LEVEL']!r}")
+
+
+def _iov_max() -> int:
+    """Return the platform's iovec limit per writev call, falling back to 1024."""
+    try:
+        limit = os.sysconf("SC_IOV_MAX")
+    except (AttributeError, ValueError, OSError):
+        return 1024
+    # -1 means "no fixed limit"; batches still need a positive chunk size
+    return limit if limit > 0 else 1024
+
+
+# Scatter-gather writes where the platform has them, bounded by its iovec limit
+_writev = getattr(os, "writev", None)
+_IOV_MAX = _iov_max()
+
+
+def _add_static_context(_: WrappedLogger, __: str, event_dict: EventDict) -> EventDict:
+    """Add the cached hostname and pid to the event."""
+    event_dict["hostname"] = _HOSTNAME
+    event_dict["pid"] = _PID
+    return event_dict
+
+
+class _CachedTimeStamper:
+    """
+    Add an ISO-8601 UTC timestamp with millisecond precision.
+
+    The seconds part is formatted once per second and reused, so most
+    events only pay for ``time.time()`` and the milliseconds.
+    """
+
+    def __init__(self) -> None:
+        # (second, formatted prefix), swapped as one object for thread safety
+        self._cache = (-1, "")
+
+    def __call__(self, _: WrappedLogger, __: str, event_dict: EventDict) -> EventDict:
+        event_dict["timestamp"] = self.now()
+        return event_dict
+
+    def now(self) -> str:
+        """Return the current time formatted as an event timestamp."""
+        now = time.time()
+        second = int(now)
+        cached_second, prefix = self._cache
+        if second != cached_second:
+            prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._cache = (second, prefix)
+        return f"{prefix}.{int((now - second) * 1000):03d}Z"
+
+
+_add_timestamp = _CachedTimeStamper()
+
+
+class LogBuffer:
+    """
+    Bytes sink that coalesces log lines into fewer writes to stdout.
+
+    ``BytesLogger`` flushes after every line, so ``flush`` is deliberately a
+    no-op here. Pending lines are written out by ``drain`` once *max_size*
+    bytes have accumulated, periodically from ``flush_logs_periodically``,
+    and at interpreter exit.
+    """
+
+    def __init__(self, max_size: int = 65536) -> None:
+        self._pending: List[bytes] = []
+        self._size = 0
+        self._max_size = max_size
+        # Guards _pending/_size; held only for bookkeeping, never during I/O
+        self._lock = threading.Lock()
+        # Serializes drains so batches reach stdout in order
+        self._drain_lock = threading.Lock()
+
+    def write(self, data: bytes) -> None:
+        with self._lock:
+            self._pending.append(data)
+            self._size += len(data)
+            full = self._size >= self._max_size
+        if full:
+            self.drain()
+
+    def flush(self) -> None:
+        pass
+
+    def _reset_after_fork(self) -> None:
+        """Drop lines inherited from the parent, which writes them itself."""
+        self._pending = []
+        self._size = 0
+        # A lock held by another parent thread at fork time stays held here
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+
+    def drain(self) -> None:
+        """Write all pending lines to stdout, with one ``writev`` per batch."""
+        with self._drain_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, []
+                self._size = 0
+            self._write_batch(batch)
+
+    @classmethod
+    def _write_batch(cls, batch: List[bytes]) -> None:
+        try:
+            cls._write_to_stdout(batch)
+        except (OSError, ValueError):
+            # As logging.Handler.handleError does: report on stderr and drop
+            # the batch, so a broken stdout never fails the logging call or
+            # stops the periodic flusher
+            if sys.stderr:
+                sys.stderr.write("--- Logging error ---\n")
+                traceback.print_exc(file=sys.stderr)
+
+    @staticmethod
+    def _write_to_stdout(batch: List[bytes]) -> None:
+        try:
+            fd = sys.stdout.fileno()
+        except (AttributeError, ValueError, io.UnsupportedOperation):
+            fd = None
+        if fd is None or _writev is None:
+            stream = sys.stdout.buffer
+            stream.write(b"".join(batch))
+            stream.flush()
+            return
+
+        # Keep ordering with anything written through sys.stdout itself
+        sys.stdout.flush()
+        for start in range(0, len(batch), _IOV_MAX):
+            chunk = batch[start:start + _IOV_MAX]
+            written = _writev(fd, chunk)
+            if written < sum(map(len, chunk)):
+                _write_all(fd, b"".join(chunk)[written:])
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """Finish a short write by looping ``os.write`` until *data* is out."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+log_buffer = LogBuffer()
+atexit.register(log_buffer.drain)
+
+
+async def flush_logs_periodically(interval: float = 0.1) -> None:
+    """Drain ``log_buffer`` every *interval* seconds until cancelled."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            log_buffer.drain()
+    finally:
+        log_buffer.drain()
+
+
+# _add_static_context's fields as a JSON fragment, for pre-rendered events
+_STATIC_JSON = orjson.dumps({"hostname": _HOSTNAME, "pid": _PID})[1:-1]
+
+
+def _after_fork_in_child() -> None:
+    """Refresh the cached pid and drop the parent's pending log lines."""
+    global _PID, _STATIC_JSON
+    _PID = os.getpid()
+    _STATIC_JSON = orjson.dumps({"hostname": _HOSTNAME, "pid": _PID})[1:-1]
+    log_buffer._reset_after_fork()
+
+
+# Workers forked after import (e.g. gunicorn --preload) must not log the
+# parent's pid or write its buffered lines a second time
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+# "level" members as add_log_level would render them, for pre-rendered events
+_LEVEL_JSON = {
+    level: b'"level":"%b"' % logging.getLevelName(level).lower().encode()
+    for level in (logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL)
+}
+
+
+def write_raw_event(level: int, members: bytes) -> None:
+    """
+    Write an event the caller already rendered, skipping the processor chain.
+
+    *members* is the event's JSON object without its closing brace, e.g.
+    ``b'{"event":"Done"'``. The level name for *level*, the static context
+    and the timestamp are appended so the line matches what the processors
+    would produce. Events below the configured level are dropped.
+
+    These lines never pass through structlog, so they are invisible to
+    ``structlog.testing.capture_logs``; patch this function in tests instead.
+    """
+    if level < _level:
+        return
+    log_buffer.write(
+        b'%b,%b,%b,"timestamp":"%b"}\n'
+        % (members, _LEVEL_JSON[level], _STATIC_JSON, _add_timestamp.now().encode())
+    )
+
+
+class RenderedContext(NamedTuple):
+    """Context serialized once by ``render_context``."""
+
+    # JSON object without its closing brace, e.g. b'{"user":"alice"'
+    members: bytes
+    # Keys in *members*, to detect events that set the same key again
+    keys: FrozenSet[str]
+
+
+# Context key holding a RenderedContext bound by bind_rendered_context
+_RENDERED_CONTEXT = "_rendered_context"
+
+
+def _dumps(obj: Any, **kwargs: Any) -> bytes:
+    """
+    Serialize with orjson, falling back to stdlib ``json`` for what it rejects.
+
+    orjson refuses integers beyond 64 bits, and non-string keys unless asked
+    to stringify them; logging such a value must not raise in the caller.
+    """
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS, **kwargs)
+    except TypeError:
+        return json.dumps(obj, **kwargs).encode()
+
+
+class _JSONRenderer:
+    """
+    Render events with orjson, splicing in context from ``render_context``.
+
+    The pre-rendered members are prepended as bytes, so a bound context is
+    not merged and re-serialized on every call. If the event sets one of
+    those keys again, it is merged as a dict instead so the later value wins.
+    """
+
+    def __init__(self) -> None:
+        self._render = structlog.processors.JSONRenderer(serializer=_dumps)
+
+    def __call__(self, logger: WrappedLogger, method_name: str, event_dict: EventDict) -> bytes:
+        rendered_context = event_dict.pop(_RENDERED_CONTEXT, None)
+        if rendered_context is None:
+            return self._render(logger, method_name, event_dict)
+        if rendered_context.keys.isdisjoint(event_dict):
+            rendered = self._render(logger, method_name, event_dict)
+            return rendered_context.members + b"," + rendered[1:]
+        merged = orjson.loads(rendered_context.members + b"}")
+        merged.update(event_dict)
+        return self._render(logger, method_name, merged)
+
+
+_render_json = _JSONRenderer()
+
+# Kept minimal: every log line in the app runs through these. format_exc_info
+# stays so exc_info/exception() never silently lose their traceback.
+_PROCESSORS = [
+    structlog.processors.add_log_level,
+    _add_static_context,
+    _add_timestamp,
+    structlog.processors.format_exc_info,
+    _render_json,
+]
+
+
+# Set once configure_structlog has run, so later calls keep cached loggers
+_configured = False
 
 
 def configure_structlog() -> None:
-    """Configure structlog for JSON structured logging."""
+    """
+    Configure structlog for JSON structured logging.
+
+    Calls below the ``LOG_LEVEL`` environment variable (default INFO) are
+    compiled into no-ops by the filtering bound logger, so they return
+    before any processor runs.
+
+    Only the first call takes effect: reconfiguring would invalidate every
+    logger cached on first use.
+    """
+    global _configured
+    if _configured:
+        return
     structlog.configure(
-        processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer(),
-        ],
+        processors=_PROCESSORS,
         context_class=dict,
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
+        # orjson already produces bytes, so write them straight to the
+        # buffered stdout sink instead of going through stdlib logging.
+        logger_factory=structlog.BytesLoggerFactory(file=log_buffer),
+        wrapper_class=structlog.make_filtering_bound_logger(_level),
         cache_logger_on_first_use=True,
     )
+    _configured = True
+
+
+def get_logger(name: str) -> FilteringBoundLogger:
+    """
+    Get a structured logger instance.
+
+    Binding the name resolves structlog's lazy proxy right away, so
+    module-level loggers are real bound loggers rather than proxies that
+    have to be resolved on the first request.
+    """
+    return structlog.get_logger().bind(logger=name)
+
+
+def render_context(**values: Any) -> RenderedContext:
+    """
+    Serialize *values* once as the opening members of a JSON event.
+
+    ``members`` is an object without its closing brace, usable both with
+    ``bind_rendered_context`` and as the start of a ``write_raw_event`` line.
+    """
+    return RenderedContext(orjson.dumps(values)[:-1], frozenset(values))
+
 
+def bind_rendered_context(
+    logger: FilteringBoundLogger, rendered: RenderedContext
+) -> FilteringBoundLogger:
+    """
+    Replace *logger*'s context with a context from ``render_context``.
 
-def get_logger(name: str) -> structlog.stdlib.BoundLogger:
-    """Get a structured logger instance."""
-    return structlog.get_logger(name)
+    The values are no longer individual context keys: ``structlog.get_context``
+    on the result returns only the opaque ``RenderedContext``. Values passed
+    later via ``bind()`` or a log call still override rendered ones.
+    """
+    return logger.new(**{_RENDERED_CONTEXT: rendered})
 
 
 # Configure structlog on import
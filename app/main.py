@@ -2,16 +2,18 @@
 FastAPI application with structured logging example.
 """
 
+import asyncio
+import contextlib
+import hashlib
 import secrets
 from typing import Dict, Any
 from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.responses import JSONResponse
-import structlog
+from structlog.typing import FilteringBoundLogger
 
-from .logger import get_logger
+from .logger import flush_logs_periodically, get_logger
 from .middleware import UserContextMiddleware
-from .dependencies import get_request_logger
 
 # Initialize the main logger
 main_logger = get_logger(__name__)
@@ -37,13 +39,22 @@ fake_users_db = {
     "admin": "admin123"
 }
 
+# Password digests computed once; unknown users are compared against a random
+# digest so every attempt costs one hash and one constant-time comparison
+_USER_HASHES = {
+    username: hashlib.sha256(password.encode()).digest()
+    for username, password in fake_users_db.items()
+}
+_DUMMY_HASH = secrets.token_bytes(32)
+
 def authenticate_user(credentials: HTTPBasicCredentials = Depends(security)):
     """Authenticate user with basic auth credentials."""
     username = credentials.username
-    password = credentials.password
+    candidate = hashlib.sha256(credentials.password.encode()).digest()
+    expected = _USER_HASHES.get(username)
     
     # Check if user exists and password is correct
-    if username in fake_users_db and secrets.compare_digest(password, fake_users_db[username]):
+    if secrets.compare_digest(expected or _DUMMY_HASH, candidate) and expected is not None:
         return username
     
     raise HTTPException(
@@ -55,19 +66,24 @@ def authenticate_user(credentials: HTTPBasicCredentials = Depends(security)):
 
 @app.on_event("startup")
 async def startup_event():
-    """Log application startup."""
+    """Log application startup and start flushing buffered logs."""
+    app.state.log_flusher = asyncio.create_task(flush_logs_periodically())
     main_logger.info("Application starting up", version="1.0.0")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Log application shutdown."""
+    """Log application shutdown and flush any buffered logs."""
     main_logger.info("Application shutting down")
+    app.state.log_flusher.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await app.state.log_flusher
 
 
 @app.get("/")
-async def root(logger: structlog.stdlib.BoundLogger = Depends(get_request_logger)) -> Dict[str, str]:
+async def root(request: Request) -> Dict[str, str]:
     """Root endpoint with structured logging."""
+    logger: FilteringBoundLogger = request.state.logger
     logger.info("Root endpoint accessed")
     return {
         "message": "Welcome to FastAPI Structured Logging Demo boss",
@@ -76,8 +92,9 @@ async def root(logger: structlog.stdlib.BoundLogger = Depends(get_request_logger
 
 
 @app.get("/login")
-async def login_info(logger: structlog.stdlib.BoundLogger = Depends(get_request_logger)) -> Dict[str, Any]:
+async def login_info(request: Request) -> Dict[str, Any]:
     """Provide login instructions and available test users."""
+    logger: FilteringBoundLogger = request.state.logger
     logger.info("Login info requested")
     return {
         "message": "Use Basic Authentication to test username logging",
@@ -102,10 +119,11 @@ async def login_info(logger: structlog.stdlib.BoundLogger = Depends(get_request_
 
 @app.get("/auth-test")
 async def auth_test(
-    current_user: str = Depends(authenticate_user),
-    logger: structlog.stdlib.BoundLogger = Depends(get_request_logger)
+    request: Request,
+    current_user: str = Depends(authenticate_user)
 ) -> Dict[str, str]:
     """Test endpoint that requires authentication."""
+    logger: FilteringBoundLogger = request.state.logger
     logger.info("Authenticated endpoint accessed", authenticated_user=current_user)
     return {
         "message": f"Hello {current_user}! You are successfully authenticated.",
@@ -117,19 +135,21 @@ async def auth_test(
 @app.get("/hello/{name}")
 async def hello_user(
     name: str,
-    logger: structlog.stdlib.BoundLogger = Depends(get_request_logger)
+    request: Request
 ) -> Dict[str, str]:
     """Personalized greeting endpoint."""
+    logger: FilteringBoundLogger = request.state.logger
     logger.info("Hello endpoint accessed", target_name=name)
     return {"message": f"Hello, {name}!"}
 
 
 @app.get("/protected")
 async def protected_endpoint(
-    current_user: str = Depends(authenticate_user),
-    logger: structlog.stdlib.BoundLogger = Depends(get_request_logger)
+    request: Request,
+    current_user: str = Depends(authenticate_user)
 ) -> Dict[str, str]:
     """Protected endpoint that requires authentication."""
+    logger: FilteringBoundLogger = request.state.logger
 
     # create sample object to log
     sample_object = {
@@ -149,23 +169,17 @@ async def protected_endpoint(
 
 @app.get("/user-info")
 async def get_user_info(
-    request: Request,
-    logger: structlog.stdlib.BoundLogger = Depends(get_request_logger)
+    request: Request
 ) -> Dict[str, Any]:
     """Get current user information from the request context."""
-    # Extract user from the logger context
-    user = "unknown"
-    if hasattr(request.state, "logger"):
-        # Access bound context from the logger
-        bound_logger = request.state.logger
-        if hasattr(bound_logger, "_context"):
-            user = bound_logger._context.get("user", "unknown")
+    logger: FilteringBoundLogger = request.state.logger
+    user = request.state.user
     
     logger.info("User info requested", requested_user=user)
     
     return {
         "user": user,
-        "request_id": id(request),
+        "request_id": request.state.request_id,
         "path": request.url.path,
         "method": request.method,
     }
@@ -173,9 +187,10 @@ async def get_user_info(
 
 @app.post("/simulate-error")
 async def simulate_error(
-    logger: structlog.stdlib.BoundLogger = Depends(get_request_logger)
+    request: Request
 ) -> Dict[str, str]:
     """Endpoint that simulates an error for testing logging."""
+    logger: FilteringBoundLogger = request.state.logger
     logger.warning("Error simulation requested")
     
     try:
@@ -192,9 +207,10 @@ async def simulate_error(
 
 @app.get("/health")
 async def health_check(
-    logger: structlog.stdlib.BoundLogger = Depends(get_request_logger)
+    request: Request
 ) -> Dict[str, str]:
     """Health check endpoint."""
+    logger: FilteringBoundLogger = request.state.logger
     logger.debug("Health check performed")
     return {"status": "healthy", "service": "fastapi-structured-logging"}
 
@@ -202,7 +218,8 @@ async def health_check(
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler with structured logging."""
-    logger = get_request_logger(request)
+    # Errors raised before the middleware ran have no request logger yet
+    logger = getattr(request.state, "logger", main_logger)
     logger.error(
         "Unhandled exception occurred",
         error=str(exc),
@@ -214,7 +231,10 @@ async def global_exception_handler(request: Request, exc: Exception):
     
     return JSONResponse(
         status_code=500,
-        content={"detail": "Internal server error", "error_id": id(request)},
+        content={
+            "detail": "Internal server error",
+            "error_id": getattr(request.state, "request_id", None),
+        },
     )
 
 
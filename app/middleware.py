@@ -3,47 +3,115 @@ Middleware for capturing user context and adding it to structured logs.
 """
 
 import base64
+import itertools
+import logging
 import re
-from typing import Callable, Optional
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-import structlog
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from .logger import get_logger
+from .logger import (
+    bind_rendered_context,
+    get_logger,
+    render_context,
+    write_raw_event,
+)
 
+# Username portion of mock "user_<name>_..." bearer tokens, matched after the prefix
+_TOKEN_USER_RE = re.compile(rb"(\w+?)(?:_|$)")
+
+# Small sequential ids rather than id(request), which is a full memory address
+_REQUEST_IDS = itertools.count(1)
+
+# The two per-request middleware events always have the same shape, so they
+# are rendered from these templates, after the request's pre-rendered context,
+# instead of through the processor chain. Key order matches what the
+# structlog renderer produces for the request logger.
+_REQUEST_STARTED = b'%b,"method":%b%b,"event":"Request started"'
+_REQUEST_COMPLETED = b'%b,"method":%b,"status_code":%d,"event":"Request completed"'
+
+# Resolved at import (after configure_structlog) and reused by every request
 logger = get_logger(__name__)
 
 
-class UserContextMiddleware(BaseHTTPMiddleware):
-    """Middleware to extract user context from requests and bind it to the logger."""
+class UserContextMiddleware:
+    """
+    Middleware to extract user context from requests and bind it to the logger.
+
+    Written as plain ASGI middleware rather than on ``BaseHTTPMiddleware`` so
+    requests are not wrapped in an extra task group and response stream.
+    """
 
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, log_request_start: bool = False) -> None:
+        self.app = app
+        # Off by default: everything needed is already bound to the
+        # request logger, so a start line per request mostly adds volume.
+        self.log_request_start = log_request_start
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Extract user context and bind it to the logger for this request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Collect the headers we need in one pass over the raw list; ASGI
+        # header names are already lowercase. Like Headers.get, the first
+        # occurrence of a repeated header wins.
+        auth_header = custom_user_header = user_agent = b""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                if not auth_header:
+                    auth_header = value
+            elif name == b"x-user-name":
+                if not custom_user_header:
+                    custom_user_header = value
+            elif name == b"user-agent":
+                if not user_agent:
+                    user_agent = value
+
         # Extract user from Authorization header
-        username = self._extract_username(request)
+        username = self._extract_username(auth_header, custom_user_header)
+        method = scope["method"]
+        request_id = next(_REQUEST_IDS)
         
-        # Create a new logger context for this request
-        request_logger = logger.bind(
+        # Serialize the request's context once; the request logger and both
+        # middleware events reuse the bytes instead of a bound dict
+        context = render_context(
+            logger=__name__,
             user=username,
-            route=request.url.path
+            route=scope["path"],
+            user_agent=user_agent.decode("latin-1"),
+            request_id=request_id,
         )
+        request_logger = bind_rendered_context(logger, context)
+        method_json = orjson.dumps(method)
         
-        # Store the logger in request state for use in routes
-        request.state.logger = request_logger
-        
+        # Store the logger, user and request id in request state for use in routes
+        state = scope.setdefault("state", {})
+        state["logger"] = request_logger
+        state["user"] = username
+        state["request_id"] = request_id
         
+        if self.log_request_start:
+            # Log the raw query string, and only when there is one, rather
+            # than building a dict of query params on every request.
+            query = scope["query_string"]
+            query_member = b',"query":' + orjson.dumps(query.decode("latin-1")) if query else b""
+            write_raw_event(logging.INFO, _REQUEST_STARTED % (context.members, method_json, query_member))
+
+        response_started = False
+
+        async def send_with_logging(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                write_raw_event(
+                    logging.INFO, _REQUEST_COMPLETED % (context.members, method_json, message["status"])
+                )
+            await send(message)
         
         try:
-            response = await call_next(request)
-            
-            
-            
-            return response
-            
+            await self.app(scope, receive, send_with_logging)
         except Exception as exc:
             # Log error
             request_logger.error(
@@ -52,60 +120,65 @@ class UserContextMiddleware(BaseHTTPMiddleware):
                 error_type=type(exc).__name__,
                 exc_info=True,
             )
+            # ServerErrorMiddleware sends the 500 outside send_with_logging,
+            # so record the completion here to keep one per request
+            if not response_started:
+                write_raw_event(logging.INFO, _REQUEST_COMPLETED % (context.members, method_json, 500))
             raise
 
-    def _extract_username(self, request: Request) -> str:
+    def _extract_username(self, auth_header: bytes, custom_user_header: bytes) -> str:
         """
-        Extract username from Authorization header.
+        Extract username from the raw Authorization and X-User-Name header values.
         
         Supports:
         - Basic auth: Authorization: Basic <base64(username:password)>
         - Bearer token: Authorization: Bearer <token> (mock extraction)
         - Custom header: X-User-Name: <username>
         """
-        auth_header = request.headers.get("authorization", "")
-        custom_user_header = request.headers.get("x-user-name", "")
-        
-        
-        
         # Check custom user header first (simplest for demo)
         if custom_user_header:
-            logger.info("Using custom user header", user=custom_user_header)
-            return custom_user_header
+            username = custom_user_header.decode("latin-1")
+            logger.info("Using custom user header", user=username)
+            return username
+        
+        # Unauthenticated requests are the common case; skip scheme parsing
+        if not auth_header:
+            return "anonymous"
+        
+        scheme, _, credentials = auth_header.partition(b" ")
         
         # Handle Basic auth
-        if auth_header.startswith("Basic "):
+        if scheme == b"Basic":
             try:
-                encoded_credentials = auth_header.split(" ", 1)[1]
-                decoded_credentials = base64.b64decode(encoded_credentials).decode("utf-8")
-                username, _ = decoded_credentials.split(":", 1)
-                
-                return username
-            except (ValueError, UnicodeDecodeError, IndexError):
-                logger.warning("Invalid Basic auth header format")
-                return "anonymous"
+                # Only the username is needed; never decode the password
+                username, separator, _ = base64.b64decode(credentials).partition(b":")
+                if separator:
+                    return username.decode("utf-8")
+            except ValueError:
+                pass
+            logger.warning("Invalid Basic auth header format")
+            return "anonymous"
         
         # Handle Bearer token (mock extraction for demo)
-        if auth_header.startswith("Bearer "):
-            token = auth_header.split(" ", 1)[1]
+        if scheme == b"Bearer":
             # In a real application, you would validate the token and extract user info
             # For demo purposes, we'll mock user extraction from token
-            return self._mock_user_from_token(token)
+            return self._mock_user_from_token(credentials)
         
         return "anonymous"
 
-    def _mock_user_from_token(self, token: str) -> str:
+    def _mock_user_from_token(self, token: bytes) -> str:
         """
         Mock user extraction from Bearer token.
         
         In a real application, this would validate the JWT token
         and extract user information from claims.
         """
-        # Simple mock: if token contains 'user_', extract what follows until the next '_'
-        if "user_" in token:
-            match = re.search(r"user_(\w+?)(?:_|$)", token)
+        # Simple mock: if token starts with 'user_', extract what follows until the next '_'
+        if token.startswith(b"user_"):
+            match = _TOKEN_USER_RE.match(token, 5)
             if match:
-                return match.group(1)
+                return match.group(1).decode("ascii")
         
         # For demo tokens, return a mock user based on token hash
         if len(token) > 10:
@@ -0,0 +1,9 @@
+"""
+Shared test setup.
+"""
+
+import os
+
+# app.logger reads LOG_LEVEL once at import; the tests expect the INFO default
+# whatever the developer's shell exports. Popped before any test imports app.
+os.environ.pop("LOG_LEVEL", None)